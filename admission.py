@@ -0,0 +1,116 @@
+# admission.py
+"""
+부하 제어 (Admission Control)
+- 동시 실행 수 제한 + 대기열: interactive 요청이 batch 요청보다 먼저 실행
+- 대기열 길이와 최근 처리 시간을 보고 단계적으로 품질을 낮춤 (graceful degradation)
+  0. full            : Haiku Architect + 갭 재검색 + Sonnet Writer
+  1. base_template   : Architect 생략, 기본 템플릿 사용
+  2. no_gap_research : + 부족한 정보 재검색 생략
+  3. fast_writer     : + Writer도 빠른 모델(Haiku) 사용
+- batch 요청은 한 단계 먼저 낮춰지고, 대기열이 가득 차면 거절됨
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+# 품질 저하 단계 (인덱스 = 단계)
+DEGRADATION_MODES = ["full", "base_template", "no_gap_research", "fast_writer"]
+
+# 기본 설정 (환경 변수로 조정)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_BATCH_QUEUE = int(os.getenv("ADMISSION_MAX_BATCH_QUEUE", "32"))
+# 단계별 임계값 (쉼표 구분, 1~3단계): 대기열 길이(건) / 최근 평균 처리 시간(초)
+ADMISSION_QUEUE_THRESHOLDS = tuple(
+    int(t) for t in os.getenv("ADMISSION_QUEUE_THRESHOLDS", "4,8,16").split(",")
+)
+ADMISSION_LATENCY_THRESHOLDS = tuple(
+    float(t) for t in os.getenv("ADMISSION_LATENCY_THRESHOLDS", "60,90,120").split(",")
+)
+
+
+class OverloadedError(RuntimeError):
+    """대기열이 가득 차서 요청을 받을 수 없음"""
+
+
+class AdmissionController:
+    """
+    TripPrepSystem 앞단의 부하 제어기
+    - admit(priority): 실행 슬롯을 얻을 때까지 대기 후 적용할 품질 단계(mode)를 반환
+    - 실행이 끝나면 처리 시간을 기록하여 다음 요청의 단계 결정에 반영
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_batch_queue: int = ADMISSION_MAX_BATCH_QUEUE,
+                 queue_thresholds: Sequence[int] = ADMISSION_QUEUE_THRESHOLDS,
+                 latency_thresholds: Sequence[float] = ADMISSION_LATENCY_THRESHOLDS,
+                 latency_window: int = 20):
+        self.max_concurrent = max_concurrent
+        self.max_batch_queue = max_batch_queue
+        self.queue_thresholds = queue_thresholds
+        self.latency_thresholds = latency_thresholds
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._latencies = deque(maxlen=latency_window)
+
+    def queue_length(self) -> int:
+        return sum(self._waiting.values())
+
+    def recent_latency(self) -> float:
+        """최근 처리 시간 평균 (초)"""
+        if not self._latencies:
+            return 0.0
+        return sum(self._latencies) / len(self._latencies)
+
+    def _degradation_level(self, priority: str) -> int:
+        queue_level = sum(self.queue_length() >= t for t in self.queue_thresholds)
+        latency_level = sum(self.recent_latency() >= t for t in self.latency_thresholds)
+        level = max(queue_level, latency_level)
+
+        # batch 요청은 부하가 있으면 한 단계 먼저 낮춤
+        if priority == PRIORITY_BATCH and (level > 0 or self._running >= self.max_concurrent):
+            level += 1
+
+        return min(level, len(DEGRADATION_MODES) - 1)
+
+    @contextmanager
+    def admit(self, priority: str = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        if priority not in PRIORITIES:
+            raise ValueError(f"알 수 없는 우선순위: {priority}")
+
+        with self._cond:
+            if priority == PRIORITY_BATCH and self.queue_length() >= self.max_batch_queue:
+                raise OverloadedError("대기열이 가득 찼습니다. 잠시 후 다시 시도하세요.")
+
+            # 도착 시점의 부하로 품질 단계 결정
+            mode = DEGRADATION_MODES[self._degradation_level(priority)]
+
+            self._waiting[priority] += 1
+            try:
+                while (self._running >= self.max_concurrent or
+                       (priority == PRIORITY_BATCH and self._waiting[PRIORITY_INTERACTIVE] > 0)):
+                    self._cond.wait()
+            finally:
+                # 대기열이 바뀌었으므로 다시 확인하도록 깨움
+                # (interactive 요청이 빠지면 그 뒤에서 기다리던 batch 요청이 빈 슬롯을 가져갈 수 있음)
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+            self._running += 1
+
+        start = time.monotonic()
+        try:
+            yield mode
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._latencies.append(time.monotonic() - start)
+                self._cond.notify_all()
@@ -1,7 +1,9 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, render_template, request, send_file, jsonify, make_response
 import markdown
 import os
-from trip_prep_final import TripPrepSystem
+from trip_prep_final import ReportGenerationError, TripPrepSystem, search_batcher
+from admission import OverloadedError, PRIORITIES, PRIORITY_INTERACTIVE
+from report_store import negotiate_encoding, report_store
 
 app = Flask(__name__)
 
@@ -17,22 +19,73 @@ def generate():
     try:
         data = request.json
         destination = data.get('destination')
+        destinations = data.get('destinations')
         keywords = data.get('keywords', [])
+        priority = data.get('priority', PRIORITY_INTERACTIVE)
         
-        if not destination:
+        if not destination and not destinations:
             return jsonify({'error': 'Destination is required'}), 400
+        if destinations is not None and not (
+                isinstance(destinations, list) and
+                all(isinstance(d, str) and d.strip() for d in destinations)):
+            return jsonify({'error': 'Destinations must be a list of non-empty strings'}), 400
+        if priority not in PRIORITIES:
+            return jsonify({'error': f'Priority must be one of {list(PRIORITIES)}'}), 400
             
-        # Generate the report
-        report_md = system.generate_report(destination, keywords)
+        # Generate the report (admission control decides the service mode)
+        if destinations:
+            result = system.handle_itinerary_request(destinations, keywords, priority)
+        else:
+            result = system.handle_request(destination, keywords, priority)
         
         # Convert Markdown to HTML for display (optional, can be done in frontend too)
         # But we'll send the raw markdown to let the frontend handle it or just display it.
         # Let's send raw markdown and let frontend render it with marked.js for better control.
         
-        return jsonify({'report': report_md})
+        # Store the report so reloads and shared links are served from /reports/<hash>
+        report_hash = report_store.put(
+            result['report'],
+            ' → '.join(destinations) if destinations else destination,
+            keywords,
+            result['models']
+        )
         
+        return jsonify({'report': result['report'], 'mode': result['mode'], 'hash': report_hash})
+        
+    except OverloadedError as e:
+        return jsonify({'error': str(e)}), 503
+    except ReportGenerationError as e:
+        # The writer failed: nothing is stored, so no hash or shareable link is returned
+        return jsonify({'error': str(e)}), 502
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/reports/<report_hash>')
+def get_report(report_hash):
+    if not report_store.exists(report_hash):
+        return jsonify({'error': 'Report not found'}), 404
+    
+    # Content-addressed: the hash is the ETag and the content never changes
+    headers = {
+        'ETag': f'"{report_hash}"',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.if_none_match.contains(report_hash):
+        return '', 304, headers
+    
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    response = make_response(report_store.read(report_hash, encoding))
+    response.headers.update(headers)
+    response.headers['Content-Type'] = 'text/markdown; charset=utf-8'
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/metrics/search')
+def search_metrics():
+    # 검색 마이크로 배칭 창 크기 및 배치 크기 통계
+    return jsonify(search_batcher.metrics())
+
 if __name__ == '__main__':
     app.run(debug=True)
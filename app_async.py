@@ -0,0 +1,67 @@
+import asyncio
+from quart import Quart, render_template, request, jsonify, make_response
+from trip_prep_final_v2 import FAST_MODEL, SMART_MODEL, generate_report, search_batcher
+from report_store import negotiate_encoding, report_store
+
+# 비동기 서버 (v2 파이프라인을 이벤트 루프에서 직접 실행)
+# 실행: hypercorn app_async:app  (또는 python app_async.py)
+app = Quart(__name__)
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/generate', methods=['POST'])
+async def generate():
+    try:
+        data = await request.get_json()
+        destination = data.get('destination')
+        keywords = data.get('keywords', [])
+
+        if not destination:
+            return jsonify({'error': 'Destination is required'}), 400
+
+        # 요청 경로에서는 rich 콘솔 출력 없이 실행
+        report_md = await generate_report(destination, keywords, verbose=False)
+
+        # 보고서 저장 (새로고침/공유 링크는 /reports/<hash> 에서 재생성 없이 제공)
+        report_hash = await asyncio.to_thread(
+            report_store.put, report_md, destination, keywords,
+            {'architect': FAST_MODEL, 'writer': SMART_MODEL}
+        )
+
+        return jsonify({'report': report_md, 'hash': report_hash})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/<report_hash>')
+async def get_report(report_hash):
+    if not report_store.exists(report_hash):
+        return jsonify({'error': 'Report not found'}), 404
+
+    # 콘텐츠 주소 기반: 해시가 곧 ETag, 내용은 바뀌지 않음
+    headers = {
+        'ETag': f'"{report_hash}"',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.if_none_match.contains(report_hash):
+        return '', 304, headers
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    body = await asyncio.to_thread(report_store.read, report_hash, encoding)
+    response = await make_response(body)
+    response.headers.update(headers)
+    response.headers['Content-Type'] = 'text/markdown; charset=utf-8'
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/metrics/search')
+async def search_metrics():
+    # 검색 마이크로 배칭 창 크기 및 배치 크기 통계
+    return jsonify(search_batcher.metrics())
+
+if __name__ == '__main__':
+    app.run()
@@ -0,0 +1,187 @@
+# evidence_index.py
+"""
+섹션별 근거 자료 선택 (BM25)
+- Tavily 검색 결과를 작은 청크로 나누고 프로세스 내 BM25 인덱스 생성
+- 커스터마이징된 템플릿의 각 섹션을 질의로 사용해 상위 k개 청크만 선택
+- Writer 프롬프트에 모든 검색 결과 대신 섹션별 관련 근거만 전달 → 입력 토큰/지연 감소
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# 청크 최대 길이(문자) / 섹션당 선택할 청크 수
+CHUNK_MAX_CHARS = 400
+SECTION_TOP_K = 3
+
+_TOKEN_RE = re.compile(r"[0-9A-Za-z]+|[가-힣]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。])\s+")
+# 최상위 섹션 번호 ("1.", "1-1.", "## 2.", "**3.**" 등, 들여쓰기 없는 줄만)
+_SECTION_RE = re.compile(r"^[#*]*\s*\**(\d+(?:-\d+)?)[.)]\s*\S")
+# 질의에서 제외할 번호 표기 ("2.", "1-1.", "a.", "- ")
+_MARKER_RE = re.compile(r"^\s*(?:[#*]*\s*\**\d+(?:-\d+)?[.)]\**|[a-z][.)]|[-*])\s*", re.MULTILINE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25용 토큰화
+    - 영문/숫자: 소문자 단어
+    - 한글: 조사가 붙어도 매칭되도록 음절 bigram 사용 ("비자를" → "비자", "자를")
+    """
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if "가" <= word[0] <= "힣" and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+    """
+    검색 결과 텍스트를 청크로 분할
+    - 빈 줄 단위 문단, "- " 로 시작하는 결과 항목을 각각 하나의 단위로 취급
+    - 제목만 있는 단위("## 쿼리")는 제외
+    - max_chars 를 넘는 단위는 문장 단위로 다시 묶음
+    """
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current: List[str] = []
+        for line in paragraph.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("- ") and current:
+                units.append(current)
+                current = []
+            current.append(line)
+        if current:
+            units.append(current)
+
+    chunks = []
+    for lines in units:
+        if all(line.startswith("#") for line in lines):
+            continue
+        unit = "\n".join(lines)
+        if len(unit) <= max_chars:
+            chunks.append(unit)
+            continue
+
+        buffer = ""
+        for sentence in _SENTENCE_RE.split(unit):
+            if buffer and len(buffer) + len(sentence) + 1 > max_chars:
+                chunks.append(buffer)
+                buffer = ""
+            buffer = f"{buffer} {sentence}".strip()
+        if buffer:
+            chunks.append(buffer)
+
+    return chunks
+
+
+def split_sections(template: str) -> List[str]:
+    """
+    템플릿을 최상위 섹션 단위로 분할 (하위 항목 a, b, c 는 상위 섹션에 포함)
+    - "<...>" 안내 줄과 "[공통 - ...]", "[도시별]" 같은 구분 줄은 제외
+    """
+    sections: List[str] = []
+    for line in template.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("<") or (stripped.startswith("[") and stripped.endswith("]")):
+            continue
+        if _SECTION_RE.match(line):
+            sections.append(line.strip())
+        elif sections:
+            sections[-1] += "\n" + line.strip()
+    return sections
+
+
+class BM25Index:
+    """
+    Okapi BM25 인덱스 (k1=1.5, b=0.75)
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lens = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_len = sum(self.doc_lens) / len(self.doc_lens) if self.doc_lens else 0.0
+
+        doc_freq: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def score(self, query: str) -> List[float]:
+        query_terms = set(tokenize(query))
+        scores = []
+        for tf, doc_len in zip(self.term_freqs, self.doc_lens):
+            norm = self.k1 * (1 - self.b + self.b * doc_len / (self.avg_len or 1))
+            score = 0.0
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """점수 > 0 인 문서 중 상위 k개의 (인덱스, 점수)"""
+        ranked = sorted(enumerate(self.score(query)), key=lambda x: x[1], reverse=True)
+        return [(i, s) for i, s in ranked[:k] if s > 0]
+
+
+def rank_sections(template: str, documents: List[Tuple[str, str]],
+                  k: int = SECTION_TOP_K) -> Tuple[List[Dict[str, str]], Dict[str, List[int]]]:
+    """
+    섹션별 상위 청크 선택
+    - documents: (출처 라벨, 검색 결과 텍스트) 목록
+    - 반환: (청크 목록 [{'label', 'text'}], {섹션: [청크 인덱스, ...]})
+    """
+    chunks = [
+        {"label": label, "text": chunk}
+        for label, text in documents
+        for chunk in chunk_text(text)
+    ]
+    index = BM25Index([f"{c['label']}\n{c['text']}" for c in chunks])
+
+    ranking = {}
+    for section in split_sections(template):
+        query = _MARKER_RE.sub("", section)
+        ranking[section] = [i for i, _ in index.top_k(query, k)]
+    return chunks, ranking
+
+
+def assemble_evidence(template: str, documents: List[Tuple[str, str]],
+                      k: int = SECTION_TOP_K) -> str:
+    """
+    Writer 프롬프트용 섹션별 근거 자료 조립
+    - 같은 청크가 여러 섹션에 선택되면 본문은 한 번만 싣고 이후에는 번호로 참조
+    - 템플릿에서 섹션을 찾지 못하면 전체 검색 결과를 그대로 반환
+    """
+    chunks, ranking = rank_sections(template, documents, k)
+    if not ranking:
+        return "\n\n".join(f"## {label}\n{text}" for label, text in documents)
+
+    output = ""
+    emitted = set()
+    for section, chunk_ids in ranking.items():
+        output += f"### {section.splitlines()[0]}\n"
+        if not chunk_ids:
+            output += "(관련 검색 결과 없음)\n\n"
+            continue
+        for i in chunk_ids:
+            if i in emitted:
+                output += f"- [근거 {i + 1}] 참고\n"
+            else:
+                emitted.add(i)
+                output += f"- [근거 {i + 1}] ({chunks[i]['label']}) {chunks[i]['text']}\n"
+        output += "\n"
+    return output
+
@@ -0,0 +1,130 @@
+# knowledge_base.py
+"""
+국가 단위 공유 지식 베이스 (법적 요건 / 입국 규정)
+- 비자, 여권 유효기간, 거주지 등록 규정은 도시가 아니라 국가 기준
+- 국가별로 한 번 검색한 법적 근거를 갱신 시각과 함께 저장하고 재사용
+- 검색 결과는 원본 필드(title/url/content)로 저장하고, 형식화는 각 파이프라인(v1/v2)이 담당
+- 국가마다 별도 파일로 저장 → 여러 워커 프로세스가 서로 다른 국가 항목을 덮어쓰지 않음
+- "일본 도쿄", "일본 오사카", "후쿠오카" → 모두 "일본" 항목 공유
+"""
+
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+# 저장 위치 및 갱신 주기 (기본 7일)
+KNOWLEDGE_BASE_PATH = os.getenv("TRIPPREP_KB_PATH", "knowledge_base")
+KNOWLEDGE_BASE_TTL_DAYS = float(os.getenv("TRIPPREP_KB_TTL_DAYS", "7"))
+
+# 법적 요건 검색에 사용하는 공식 소스
+LEGAL_DOMAINS = ["mofa.go.kr", "0404.go.kr"]
+
+# 주요 여행 도시 → 국가 매핑
+CITY_TO_COUNTRY = {
+    # 일본
+    "도쿄": "일본", "오사카": "일본", "교토": "일본", "후쿠오카": "일본",
+    "삿포로": "일본", "오키나와": "일본", "나고야": "일본", "고베": "일본",
+    # 동남아
+    "방콕": "태국", "치앙마이": "태국", "푸켓": "태국", "파타야": "태국",
+    "다낭": "베트남", "하노이": "베트남", "호치민": "베트남", "나트랑": "베트남", "푸꾸옥": "베트남",
+    "세부": "필리핀", "마닐라": "필리핀", "보라카이": "필리핀",
+    "발리": "인도네시아", "자카르타": "인도네시아",
+    "쿠알라룸푸르": "말레이시아", "코타키나발루": "말레이시아",
+    # 중화권
+    "타이베이": "대만", "가오슝": "대만",
+    "상하이": "중국", "베이징": "중국", "칭다오": "중국",
+    # 유럽
+    "파리": "프랑스", "니스": "프랑스",
+    "런던": "영국",
+    "로마": "이탈리아", "밀라노": "이탈리아", "베네치아": "이탈리아", "피렌체": "이탈리아",
+    "바르셀로나": "스페인", "마드리드": "스페인",
+    "프라하": "체코", "비엔나": "오스트리아", "취리히": "스위스",
+    # 미주 / 오세아니아
+    "뉴욕": "미국", "로스앤젤레스": "미국", "샌프란시스코": "미국", "하와이": "미국",
+    "밴쿠버": "캐나다", "토론토": "캐나다",
+    "시드니": "호주", "멜버른": "호주",
+}
+
+# 도시 없이 국가명만 입력하는 경우 / 도시국가
+KNOWN_COUNTRIES = set(CITY_TO_COUNTRY.values()) | {"싱가포르", "홍콩", "마카오", "몽골", "괌"}
+
+
+def resolve_country(destination: str) -> str:
+    """
+    여행지 문자열에서 국가명을 추출
+    - 국가명이 포함되어 있으면 그대로 사용 ("일본 도쿄" → "일본")
+    - 도시명만 있으면 매핑 테이블 사용 ("후쿠오카" → "일본")
+    - 알 수 없으면 여행지 문자열 자체를 키로 사용
+    """
+    tokens = destination.split()
+
+    for token in tokens:
+        if token in KNOWN_COUNTRIES:
+            return token
+
+    for token in tokens:
+        if token in CITY_TO_COUNTRY:
+            return CITY_TO_COUNTRY[token]
+
+    return destination.strip()
+
+
+class CountryKnowledgeBase:
+    """
+    국가별 법적 근거 저장소 (디렉터리, 국가당 JSON 파일 1개)
+    - get(): 갱신 주기 내의 항목만 반환, 만료되었거나 없으면 None
+    - put(): 검색 결과 원본 필드와 갱신 시각(refreshed_at) 저장
+    - 프로세스 내 캐시 없이 매번 파일을 읽으므로 다른 워커가 갱신한 항목도 바로 보임
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_BASE_PATH,
+                 ttl_days: float = KNOWLEDGE_BASE_TTL_DAYS):
+        self.path = path
+        self.ttl = timedelta(days=ttl_days)
+
+    def _entry_path(self, country: str) -> str:
+        # 국가 키는 임의의 여행지 문자열일 수 있으므로 파일명으로 안전하게 인코딩
+        return os.path.join(self.path, f"{quote(country, safe='')}.json")
+
+    def get(self, country: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(country), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        refreshed_at = datetime.fromisoformat(entry["refreshed_at"])
+        if datetime.now(timezone.utc) - refreshed_at > self.ttl:
+            return None
+
+        return entry
+
+    def put(self, country: str, query: str, results: List[Dict]):
+        entry = {
+            "country": country,
+            "query": query,
+            "results": [
+                {key: result.get(key, "") for key in ("title", "url", "content")}
+                for result in results
+            ],
+            "refreshed_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        # 고유한 임시 파일에 쓴 뒤 교체 → 같은 국가를 동시에 갱신해도 파일이 깨지지 않음
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._entry_path(country))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# 프로세스 전역 공유 인스턴스
+knowledge_base = CountryKnowledgeBase()
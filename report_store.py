@@ -0,0 +1,161 @@
+# report_store.py
+"""
+콘텐츠 주소 기반 보고서 저장소 (Content-addressed report store)
+- 보고서 본문의 SHA-256 해시를 키로 gzip 압축 저장 (같은 보고서는 한 번만 저장)
+- 메타데이터: 여행지, 키워드, 생성 시각, 사용 모델 (보고서마다 본문 옆에 JSON 파일로 저장)
+- 조회 시 gzip 요청이면 저장된 압축본을 그대로 전송 (디스크 읽기 1회)
+- 여러 워커 프로세스가 같은 디렉터리를 공유해도 되도록 프로세스 내 캐시 없이 파일 기준으로 동작
+- brotli는 선택 의존성: 설치되어 있으면 첫 요청 때 .br 파일을 만들어 재사용
+"""
+
+import os
+import gzip
+import hashlib
+import json
+import re
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성
+    brotli = None
+
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", "report_store")
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """
+    Accept-Encoding 헤더에서 응답 인코딩 선택 (br > gzip > identity, q=0 은 제외)
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+
+    def ok(name: str) -> bool:
+        return accepted.get(name, accepted.get("*", 0.0)) > 0
+
+    if brotli is not None and ok("br"):
+        return "br"
+    if ok("gzip"):
+        return "gzip"
+    return "identity"
+
+
+class ReportStore:
+    """
+    보고서 저장소
+    - objects/<해시 앞 2자리>/<해시>.md.gz : gzip 압축 본문 (+ 선택적으로 .md.br)
+    - objects/<해시 앞 2자리>/<해시>.json  : 메타데이터
+    - 공유 인덱스 파일 없이 보고서마다 파일을 따로 쓰므로 여러 워커가 동시에 저장해도 서로 덮어쓰지 않음
+    - 보고서 존재 여부는 본문 파일 기준
+    """
+
+    def __init__(self, root: str = REPORT_STORE_DIR):
+        self.root = root
+
+    def _object_path(self, report_hash: str, suffix: str) -> str:
+        return os.path.join(self.root, "objects", report_hash[:2], f"{report_hash}.md{suffix}")
+
+    def _metadata_path(self, report_hash: str) -> str:
+        return os.path.join(self.root, "objects", report_hash[:2], f"{report_hash}.json")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """임시 파일(고유 이름)에 쓴 뒤 교체 → 동시 쓰기끼리 충돌하지 않음"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def exists(self, report_hash: str) -> bool:
+        return bool(_HASH_RE.match(report_hash)) and os.path.exists(
+            self._object_path(report_hash, ".gz")
+        )
+
+    def put(self, report: str, destination: str, keywords: List[str],
+            models: Dict[str, Optional[str]]) -> str:
+        """
+        보고서 저장 후 해시 반환 (이미 있는 보고서면 기존 항목 유지)
+        """
+        body = report.encode("utf-8")
+        report_hash = hashlib.sha256(body).hexdigest()
+
+        if self.exists(report_hash) and os.path.exists(self._metadata_path(report_hash)):
+            return report_hash
+
+        # mtime=0: 같은 본문이면 압축 결과도 항상 같도록
+        self._write_atomic(
+            self._object_path(report_hash, ".gz"),
+            gzip.compress(body, compresslevel=9, mtime=0)
+        )
+        metadata = {
+            "destination": destination,
+            "keywords": keywords,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "models": models,
+            "size": len(body),
+        }
+        self._write_atomic(
+            self._metadata_path(report_hash),
+            json.dumps(metadata, ensure_ascii=False, indent=2).encode("utf-8")
+        )
+
+        return report_hash
+
+    def get_metadata(self, report_hash: str) -> Optional[Dict]:
+        if not _HASH_RE.match(report_hash):
+            return None
+        try:
+            with open(self._metadata_path(report_hash), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def read(self, report_hash: str, encoding: str = "identity") -> bytes:
+        """
+        저장된 보고서를 요청한 인코딩(gzip / br / identity)으로 반환
+        """
+        gz_path = self._object_path(report_hash, ".gz")
+
+        if encoding == "gzip":
+            with open(gz_path, "rb") as f:
+                return f.read()
+
+        if encoding == "br":
+            br_path = self._object_path(report_hash, ".br")
+            try:
+                with open(br_path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+            with open(gz_path, "rb") as f:
+                data = brotli.compress(gzip.decompress(f.read()))
+            self._write_atomic(br_path, data)
+            return data
+
+        with open(gz_path, "rb") as f:
+            return gzip.decompress(f.read())
+
+
+# 프로세스 전역 공유 인스턴스
+report_store = ReportStore()
@@ -0,0 +1,161 @@
+# search_batcher.py
+"""
+검색 요청 마이크로 배칭 (Micro-batching)
+- 짧은 시간 창(window) 동안 들어온 Tavily 검색 요청을 모아서 한 번에 처리
+- 서로 다른 요청(파이프라인)의 같은 쿼리는 정규화 후 하나로 합쳐서 한 번만 검색
+- 중복을 제거한 쿼리는 제한된 병렬도로 실행하고, 결과를 기다리는 모든 요청에 전달
+- 동기(스레드) 호출은 search(), 비동기 호출은 asearch() 사용
+"""
+
+import os
+import asyncio
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 기본 설정 (환경 변수로 조정)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "20"))
+SEARCH_BATCH_MAX_PARALLEL = int(os.getenv("SEARCH_BATCH_MAX_PARALLEL", "16"))
+
+
+def normalize_query(query: str) -> str:
+    """
+    중복 판단용 쿼리 정규화
+    - 유니코드 NFKC, 대소문자 무시, 연속 공백 정리, 끝의 문장부호 제거
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip(" ?!.,")
+
+
+class SearchBatcher:
+    """
+    Tavily 검색 앞단의 마이크로 배칭 디스패처
+    - search_fn: 실제 검색 함수 (예: tavily_client.search)
+    - window_ms: 요청을 모으는 시간 창 (첫 요청 도착 시점부터)
+    - max_parallel: 한 번에 실행할 최대 검색 수
+    """
+
+    def __init__(self, search_fn: Callable[..., Dict],
+                 window_ms: float = SEARCH_BATCH_WINDOW_MS,
+                 max_parallel: int = SEARCH_BATCH_MAX_PARALLEL):
+        self.search_fn = search_fn
+        self.window_ms = window_ms
+        self.max_parallel = max_parallel
+
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="search-batch")
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Tuple[Dict, Future]] = {}
+        self._pending_requests = 0
+        self._timer: Optional[threading.Timer] = None
+
+        # 통계
+        self._batches = 0
+        self._requests = 0
+        self._dispatched = 0
+        self._max_batch_size = 0
+
+    def submit(self, query: str, search_depth: str = "basic", max_results: int = 3,
+               include_domains: Optional[List[str]] = None) -> Future:
+        """검색 요청 등록 (같은 창 안의 중복 요청은 같은 Future를 공유)"""
+        key = (
+            normalize_query(query),
+            search_depth,
+            max_results,
+            tuple(sorted(include_domains)) if include_domains else None,
+        )
+        kwargs = {
+            "query": query,
+            "search_depth": search_depth,
+            "max_results": max_results,
+            "include_domains": include_domains,
+        }
+
+        with self._lock:
+            if key in self._pending:
+                future = self._pending[key][1]
+            else:
+                future = Future()
+                self._pending[key] = (kwargs, future)
+            self._pending_requests += 1
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_ms / 1000, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        return future
+
+    def search(self, query: str, search_depth: str = "basic", max_results: int = 3,
+               include_domains: Optional[List[str]] = None) -> Dict:
+        """동기 검색 (결과가 나올 때까지 대기)"""
+        return self.submit(query, search_depth, max_results, include_domains).result()
+
+    async def asearch(self, query: str, search_depth: str = "basic", max_results: int = 3,
+                      include_domains: Optional[List[str]] = None) -> Dict:
+        """
+        비동기 검색 (이벤트 루프를 막지 않음)
+        - 공유 Future를 직접 await 하지 않고 요청마다 별도 asyncio Future로 결과를 전달
+          (한 요청이 취소되어도 같은 쿼리를 기다리는 다른 요청에는 영향 없음)
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def _deliver(source: Future):
+            if waiter.cancelled():
+                return
+            if source.cancelled():
+                waiter.cancel()
+            elif source.exception() is not None:
+                waiter.set_exception(source.exception())
+            else:
+                waiter.set_result(source.result())
+
+        def _on_done(source: Future):
+            try:
+                loop.call_soon_threadsafe(_deliver, source)
+            except RuntimeError:  # 이벤트 루프가 이미 종료됨
+                pass
+
+        self.submit(query, search_depth, max_results, include_domains).add_done_callback(_on_done)
+        return await waiter
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending
+            requests = self._pending_requests
+            self._pending = {}
+            self._pending_requests = 0
+            self._timer = None
+
+            self._batches += 1
+            self._requests += requests
+            self._dispatched += len(batch)
+            self._max_batch_size = max(self._max_batch_size, requests)
+
+        for kwargs, future in batch.values():
+            self._executor.submit(self._run, kwargs, future)
+
+    def _run(self, kwargs: Dict, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self.search_fn(**kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    def metrics(self) -> Dict:
+        """배칭 설정 및 배치 크기 통계"""
+        with self._lock:
+            return {
+                "window_ms": self.window_ms,
+                "max_parallel": self.max_parallel,
+                "batches": self._batches,
+                "requests": self._requests,
+                "dispatched": self._dispatched,
+                "deduplicated": self._requests - self._dispatched,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_size,
+            }
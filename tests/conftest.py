@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 모듈(evidence_index 등)을 import 할 수 있도록 경로 추가
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
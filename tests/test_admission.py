@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from admission import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionController,
+    OverloadedError,
+)
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def _start_waiter(controller, priority, order, release=None):
+    def run():
+        with controller.admit(priority):
+            order.append(priority)
+            if release is not None:
+                release.wait(2)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_interactive_runs_before_batch():
+    controller = AdmissionController(max_concurrent=1)
+    order = []
+    release = threading.Event()
+
+    holder = _start_waiter(controller, PRIORITY_INTERACTIVE, [], release)
+    _wait_until(lambda: controller._running == 1)
+    batch = _start_waiter(controller, PRIORITY_BATCH, order)
+    _wait_until(lambda: controller._waiting[PRIORITY_BATCH] == 1)
+    interactive = _start_waiter(controller, PRIORITY_INTERACTIVE, order)
+    _wait_until(lambda: controller._waiting[PRIORITY_INTERACTIVE] == 1)
+
+    release.set()
+    for thread in (holder, batch, interactive):
+        thread.join(2)
+
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+
+def test_batch_takes_free_slot_after_interactive_is_admitted():
+    controller = AdmissionController(max_concurrent=2)
+    order = []
+    release_holders = threading.Event()
+    release_waiters = threading.Event()
+
+    holders = [_start_waiter(controller, PRIORITY_INTERACTIVE, [], release_holders) for _ in range(2)]
+    _wait_until(lambda: controller._running == 2)
+    batch = _start_waiter(controller, PRIORITY_BATCH, order, release_waiters)
+    _wait_until(lambda: controller._waiting[PRIORITY_BATCH] == 1)
+    interactive = _start_waiter(controller, PRIORITY_INTERACTIVE, order, release_waiters)
+    _wait_until(lambda: controller._waiting[PRIORITY_INTERACTIVE] == 1)
+
+    # 두 슬롯이 비면 interactive와 batch 모두 실행되어야 함
+    release_holders.set()
+    _wait_until(lambda: len(order) == 2)
+    assert controller._running == 2
+    assert controller.queue_length() == 0
+
+    release_waiters.set()
+    for thread in holders + [batch, interactive]:
+        thread.join(2)
+
+
+def test_batch_is_rejected_when_queue_is_full():
+    controller = AdmissionController(max_concurrent=1, max_batch_queue=1)
+    release = threading.Event()
+
+    holder = _start_waiter(controller, PRIORITY_INTERACTIVE, [], release)
+    _wait_until(lambda: controller._running == 1)
+    queued = _start_waiter(controller, PRIORITY_BATCH, [])
+    _wait_until(lambda: controller.queue_length() == 1)
+
+    with pytest.raises(OverloadedError):
+        with controller.admit(PRIORITY_BATCH):
+            pass
+
+    # interactive 요청은 대기열이 가득 차도 거절하지 않음
+    interactive = _start_waiter(controller, PRIORITY_INTERACTIVE, [])
+    _wait_until(lambda: controller._waiting[PRIORITY_INTERACTIVE] == 1)
+
+    release.set()
+    for thread in (holder, queued, interactive):
+        thread.join(2)
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with AdmissionController().admit("urgent"):
+            pass
+
+
+@pytest.mark.parametrize("queue_length, expected", [
+    (0, "full"),
+    (3, "full"),
+    (4, "base_template"),
+    (8, "no_gap_research"),
+    (16, "fast_writer"),
+    (100, "fast_writer"),
+])
+def test_mode_by_queue_length(queue_length, expected):
+    controller = AdmissionController(queue_thresholds=(4, 8, 16))
+    controller._waiting[PRIORITY_BATCH] = queue_length
+
+    with controller.admit(PRIORITY_INTERACTIVE) as mode:
+        assert mode == expected
+
+
+@pytest.mark.parametrize("latency, expected", [
+    (10, "full"),
+    (60, "base_template"),
+    (90, "no_gap_research"),
+    (120, "fast_writer"),
+])
+def test_mode_by_recent_latency(latency, expected):
+    controller = AdmissionController(latency_thresholds=(60, 90, 120))
+    controller._latencies.append(latency)
+
+    with controller.admit(PRIORITY_INTERACTIVE) as mode:
+        assert mode == expected
+
+
+def test_batch_is_degraded_one_step_earlier():
+    controller = AdmissionController(max_concurrent=2, latency_thresholds=(60, 90, 120))
+
+    with controller.admit(PRIORITY_BATCH) as mode:
+        assert mode == "full"
+
+    controller._latencies.clear()
+    controller._latencies.append(60)
+    with controller.admit(PRIORITY_BATCH) as mode:
+        assert mode == "no_gap_research"
+
+    controller._latencies.clear()
+    controller._latencies.append(500)
+    with controller.admit(PRIORITY_BATCH) as mode:
+        assert mode == "fast_writer"
@@ -0,0 +1,75 @@
+from evidence_index import assemble_evidence, rank_sections, split_sections
+
+TEMPLATE = """
+<보고서 템플릿>
+1. 해당 국가 특이사항
+2. 필수 법적 요구사항
+   a. 비자/무비자 규정
+   b. 여권 유효기간
+   c. 거주지 등록 의무
+12. 사용자 키워드 관련 내용
+   a. 라멘 관련 정보
+</보고서 템플릿>
+"""
+
+DOCUMENTS = [
+    ("법적 요건", "## 일본 입국 규정 비자 외교부 필수 요건\n\n"
+               "### 출처 1: 외교부 해외안전여행\n"
+               "대한민국 국민은 90일 이내 관광 목적 방문 시 무비자 입국이 가능합니다. "
+               "여권 유효기간은 입국 시 체류 기간 이상 남아 있어야 합니다.\n\n"),
+    ("주의사항", "## 일본 도쿄 여행 주의사항 금지 사항 특이사항\n\n"
+              "### 출처 1: 도쿄 여행 에티켓\n"
+              "지하철 내 통화는 자제하고, 지정된 흡연 구역 외 길거리 흡연 시 과태료가 부과됩니다.\n\n"),
+    ("키워드", "## 일본 도쿄 라멘 추천\n\n"
+            "### 출처 1: 도쿄 라멘 맛집\n"
+            "신주쿠의 돈코츠 라멘과 츠케멘 전문점이 인기가 많습니다.\n\n"),
+]
+
+
+def _section(ranking, number):
+    return next(s for s in ranking if s.startswith(f"{number}."))
+
+
+def test_split_sections_keeps_sub_items_in_parent():
+    sections = split_sections(TEMPLATE)
+
+    assert [s.splitlines()[0] for s in sections] == [
+        "1. 해당 국가 특이사항",
+        "2. 필수 법적 요구사항",
+        "12. 사용자 키워드 관련 내용",
+    ]
+    assert "여권 유효기간" in sections[1]
+
+
+def test_split_sections_skips_banner_lines():
+    sections = split_sections(
+        "[공통 - 여정 전체에 한 번만 작성]\n1. 해당 국가 특이사항\n7. 준비물\n[도시별]\n8. 도쿄\n   a. 숙박\n"
+    )
+
+    assert sections == ["1. 해당 국가 특이사항", "7. 준비물", "8. 도쿄\na. 숙박"]
+
+
+def test_legal_chunk_ranks_first_for_legal_section():
+    chunks, ranking = rank_sections(TEMPLATE, DOCUMENTS)
+
+    top = ranking[_section(ranking, 2)][0]
+    assert chunks[top]["label"] == "법적 요건"
+
+
+def test_keyword_chunk_ranks_first_for_keyword_section():
+    chunks, ranking = rank_sections(TEMPLATE, DOCUMENTS)
+
+    top = ranking[_section(ranking, 12)][0]
+    assert chunks[top]["label"] == "키워드"
+
+
+def test_assemble_evidence_includes_each_chunk_once():
+    evidence = assemble_evidence(TEMPLATE, DOCUMENTS)
+
+    assert evidence.count("무비자 입국이 가능합니다") == 1
+
+
+def test_assemble_evidence_falls_back_without_sections():
+    evidence = assemble_evidence("목차 없음", DOCUMENTS)
+
+    assert "## 법적 요건" in evidence
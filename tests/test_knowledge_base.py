@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from knowledge_base import CountryKnowledgeBase, resolve_country
+
+
+def test_resolve_country():
+    assert resolve_country("일본 도쿄") == "일본"
+    assert resolve_country("후쿠오카") == "일본"
+    assert resolve_country("베트남") == "베트남"
+    assert resolve_country(" 아이슬란드 ") == "아이슬란드"
+
+
+def test_put_and_get_keeps_raw_result_fields(tmp_path):
+    kb = CountryKnowledgeBase(str(tmp_path))
+
+    kb.put("일본", "일본 비자", [{"title": "비자", "url": "https://0404.go.kr", "content": "무비자 90일", "score": 0.9}])
+
+    entry = kb.get("일본")
+    assert entry["query"] == "일본 비자"
+    assert entry["results"] == [{"title": "비자", "url": "https://0404.go.kr", "content": "무비자 90일"}]
+    assert kb.get("태국") is None
+
+
+def test_expired_entry_is_not_returned(tmp_path):
+    kb = CountryKnowledgeBase(str(tmp_path), ttl_days=7)
+    kb.put("일본", "일본 비자", [])
+
+    path = kb._entry_path("일본")
+    with open(path, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["refreshed_at"] = (datetime.now(timezone.utc) - timedelta(days=8)).isoformat()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+
+    assert kb.get("일본") is None
+
+
+def test_workers_do_not_erase_each_others_countries(tmp_path):
+    worker_a = CountryKnowledgeBase(str(tmp_path))
+    worker_b = CountryKnowledgeBase(str(tmp_path))
+
+    assert worker_a.get("일본") is None
+    worker_b.put("태국", "태국 비자", [])
+    worker_a.put("일본", "일본 비자", [])
+
+    assert worker_a.get("태국") is not None
+    assert worker_b.get("일본") is not None
+
+
+def test_country_key_cannot_escape_directory(tmp_path):
+    kb = CountryKnowledgeBase(str(tmp_path / "kb"))
+    kb.put("../밖", "쿼리", [])
+
+    assert [p.name for p in tmp_path.iterdir()] == ["kb"]
+    assert kb.get("../밖") is not None
@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import multiprocessing
+import threading
+
+from report_store import ReportStore, negotiate_encoding
+
+
+def test_put_is_content_addressed_and_idempotent(tmp_path):
+    store = ReportStore(str(tmp_path))
+
+    first = store.put("# 도쿄\n본문", "일본 도쿄", ["라멘"], {"writer": "w"})
+    second = store.put("# 도쿄\n본문", "다른 여행지", [], {})
+
+    assert first == second
+    assert store.get_metadata(first)["destination"] == "일본 도쿄"
+    assert store.read(first).decode("utf-8") == "# 도쿄\n본문"
+    assert gzip.decompress(store.read(first, "gzip")).decode("utf-8") == "# 도쿄\n본문"
+
+
+def test_workers_sharing_a_directory_see_each_others_reports(tmp_path):
+    worker_a = ReportStore(str(tmp_path))
+    worker_b = ReportStore(str(tmp_path))
+
+    hash_a = worker_a.put("보고서 A", "일본 도쿄", [], {})
+    assert worker_b.exists(hash_a)
+
+    hash_b = worker_b.put("보고서 B", "일본 오사카", [], {})
+
+    assert worker_a.get_metadata(hash_a) is not None
+    assert worker_a.get_metadata(hash_b) is not None
+
+
+def _store_reports(root, worker, count):
+    store = ReportStore(root)
+    for i in range(count):
+        store.put(f"워커 {worker} 보고서 {i}", f"여행지 {worker}-{i}", [], {})
+
+
+def test_worker_processes_do_not_lose_each_others_metadata(tmp_path):
+    workers, count = 4, 40
+    processes = [
+        multiprocessing.Process(target=_store_reports, args=(str(tmp_path), w, count))
+        for w in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(30)
+        assert p.exitcode == 0
+
+    store = ReportStore(str(tmp_path))
+    metadata = [
+        store.get_metadata(hashlib.sha256(f"워커 {w} 보고서 {i}".encode("utf-8")).hexdigest())
+        for w in range(workers)
+        for i in range(count)
+    ]
+    assert all(m is not None for m in metadata)
+    assert {m["destination"] for m in metadata} == {
+        f"여행지 {w}-{i}" for w in range(workers) for i in range(count)
+    }
+
+
+def test_exists_rejects_invalid_hashes(tmp_path):
+    store = ReportStore(str(tmp_path))
+
+    assert not store.exists("../index")
+    assert not store.exists("0" * 64)
+    assert store.get_metadata("../index") is None
+    assert store.get_metadata("0" * 64) is None
+
+
+def test_concurrent_atomic_writes_to_same_path(tmp_path):
+    target = tmp_path / "objects" / "ab" / "report.md.br"
+    errors = []
+
+    def write():
+        try:
+            ReportStore._write_atomic(str(target), b"data")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert target.read_bytes() == b"data"
+    assert [p.name for p in target.parent.iterdir()] == ["report.md.br"]
+
+
+def test_negotiate_encoding_respects_zero_quality():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") == "identity"
+    assert negotiate_encoding("") == "identity"
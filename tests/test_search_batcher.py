@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from search_batcher import SearchBatcher, normalize_query
+
+
+def _recording_search(calls, release=None):
+    def search(**kwargs):
+        if release is not None:
+            release.wait(timeout=5)
+        calls.append(kwargs["query"])
+        return {"results": [{"content": kwargs["query"]}]}
+    return search
+
+
+def test_normalize_query_merges_spacing_case_and_punctuation():
+    assert normalize_query("  도쿄   라멘? ") == normalize_query("도쿄 라멘")
+    assert normalize_query("Tokyo RAMEN") == normalize_query("tokyo ramen")
+
+
+def test_duplicate_queries_are_dispatched_once():
+    calls = []
+    batcher = SearchBatcher(_recording_search(calls), window_ms=20, max_parallel=4)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.asearch("도쿄 라멘"),
+            batcher.asearch("도쿄  라멘 "),
+            batcher.asearch("오사카 라멘"),
+        )
+
+    results = asyncio.run(run())
+
+    assert sorted(calls) == ["도쿄 라멘", "오사카 라멘"]
+    assert results[0] == results[1]
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 3
+    assert metrics["dispatched"] == 2
+    assert metrics["deduplicated"] == 1
+
+
+def test_cancelling_one_waiter_does_not_cancel_merged_waiters():
+    calls = []
+    release = threading.Event()
+    batcher = SearchBatcher(_recording_search(calls, release), window_ms=20, max_parallel=4)
+
+    async def run():
+        first = asyncio.create_task(batcher.asearch("도쿄 라멘"))
+        second = asyncio.create_task(batcher.asearch("도쿄  라멘 "))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        return await second, first
+
+    result, first = asyncio.run(run())
+
+    assert first.cancelled()
+    assert result == {"results": [{"content": "도쿄 라멘"}]}
+    assert calls == ["도쿄 라멘"]
+
+
+def test_search_errors_reach_every_waiter():
+    def failing_search(**kwargs):
+        raise RuntimeError("boom")
+
+    batcher = SearchBatcher(failing_search, window_ms=10)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.asearch("q"), batcher.asearch("q"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -10,7 +10,12 @@ from dotenv import load_dotenv
 import os
 import anthropic
 from tavily import TavilyClient
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Dict, Optional
+from admission import AdmissionController, DEGRADATION_MODES, PRIORITY_INTERACTIVE
+from evidence_index import assemble_evidence
+from knowledge_base import LEGAL_DOMAINS, knowledge_base, resolve_country
+from search_batcher import SearchBatcher
 
 # .env 파일 로드
 load_dotenv()
@@ -26,11 +31,18 @@ if not ANTHROPIC_API_KEY or not TAVILY_API_KEY:
 anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
 tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
 
+# 동시 요청의 검색을 짧은 시간 창 단위로 모아 중복 제거 후 실행
+search_batcher = SearchBatcher(tavily_client.search)
+
 # 모델 설정
 SCOUT_MODEL = "claude-3-5-haiku-20241022"      # Agent 1, 2: 빠르고 저렴
 WRITER_MODEL = "claude-sonnet-4-5-20250929"    # Agent 3: 최고 품질 (Sonnet 4.5 최신!)
 
 
+class ReportGenerationError(RuntimeError):
+    """최종 보고서 작성 실패 (실패한 결과는 저장/공유하지 않음)"""
+
+
 class ScoutAgent:
     """
     Agent 1: 정찰병 (Scout)
@@ -51,14 +63,9 @@ class ScoutAgent:
         print(f"📍 대상: {destination}")
         print(f"🔑 키워드: {keywords}")
         
-        # 1. 법적 요구사항 검색 (신뢰도 최우선)
+        # 1. 법적 요구사항 검색 (신뢰도 최우선, 국가 단위로 공유)
         print(f"\n[1/3] 법적 요구사항 검색 중...")
-        legal_query = f"{destination} 입국 규정 비자 외교부 필수 요건"
-        legal_results = self._search_with_tavily(
-            legal_query,
-            search_depth="advanced",
-            include_domains=["mofa.go.kr", "0404.go.kr"]
-        )
+        legal_results = self._search_legal(resolve_country(destination))
         
         # 2. 주의사항 및 특이사항 검색
         print(f"\n[2/3] 주의사항 검색 중...")
@@ -86,39 +93,127 @@ class ScoutAgent:
             'keyword_info': keyword_results
         }
     
+    def scout_itinerary(self, destinations: List[str], keywords: List[str]) -> Dict[str, Any]:
+        """
+        여러 도시 정찰 검색 (병렬)
+        - 법적 요구사항, 주의사항, 키워드: 국가 단위로 한 번만 검색하여 도시 간 공유
+        - 관광지/교통: 도시별로 검색 (city_info: 도시 → 검색 결과)
+        - 숙박 등 나머지 도시별 정보는 Writer의 도시별 재검색으로 보완
+        """
+        print(f"\n{'='*60}")
+        print(f"{self.name}: 여정 정찰 시작")
+        print(f"{'='*60}")
+        print(f"📍 대상: {' → '.join(destinations)}")
+        print(f"🔑 키워드: {keywords}")
+        
+        countries = list(dict.fromkeys(resolve_country(d) for d in destinations))
+        cities = list(dict.fromkeys(destinations))
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            legal = {c: executor.submit(self._search_legal, c) for c in countries}
+            warning = {
+                c: executor.submit(
+                    self._search_with_tavily,
+                    f"{c} 여행 주의사항 금지 사항 특이사항",
+                    search_depth="basic"
+                )
+                for c in countries
+            }
+            keyword = {}
+            if keywords:
+                keyword = {
+                    c: executor.submit(
+                        self._search_with_tavily,
+                        f"{c} {keywords[0]} 추천",
+                        search_depth="basic"
+                    )
+                    for c in countries
+                }
+            city = {
+                d: executor.submit(
+                    self._search_with_tavily,
+                    f"{d} 주요 관광지 교통",
+                    search_depth="basic"
+                )
+                for d in cities
+            }
+        
+        print(f"\n✅ {self.name}: 여정 정찰 완료! "
+              f"(국가 {len(countries)}곳, 도시 {len(cities)}곳, 키워드 검색 {len(keyword)}건)")
+        
+        return {
+            'legal_info': "".join(f.result() for f in legal.values()),
+            'warning_info': "".join(f.result() for f in warning.values()),
+            'keyword_info': "".join(f.result() for f in keyword.values()),
+            'city_info': {d: f.result() for d, f in city.items()}
+        }
+    
+    def _search_legal(self, country: str) -> str:
+        """
+        법적 요구사항 검색 (국가 지식 베이스 우선)
+        - 같은 국가의 다른 도시 요청이 이미 검색했다면 저장된 결과 재사용
+        - 새로 검색한 결과는 성공한 경우에만 저장
+        """
+        entry = knowledge_base.get(country)
+        if entry:
+            print(f"   ✓ 국가 지식 베이스 사용: {country} (갱신: {entry['refreshed_at'][:10]})")
+            return self._format_results(entry['query'], {'results': entry['results']})
+
+        legal_query = f"{country} 입국 규정 비자 외교부 필수 요건"
+        try:
+            results = search_batcher.search(
+                query=legal_query,
+                search_depth="advanced",
+                max_results=3,
+                include_domains=LEGAL_DOMAINS
+            )
+        except Exception as e:
+            print(f"   ❌ 검색 실패: {str(e)}")
+            return f"## {legal_query}\n\n검색 실패: {str(e)}\n\n"
+
+        output = self._format_results(legal_query, results)
+        if results.get('results'):
+            knowledge_base.put(country, legal_query, results['results'])
+        return output
+
     def _search_with_tavily(self, query: str, search_depth: str = "basic", 
                            include_domains: List[str] = None) -> str:
         """
         Tavily로 검색하고 결과를 문자열로 반환
         """
         try:
-            results = tavily_client.search(
+            results = search_batcher.search(
                 query=query,
                 search_depth=search_depth,
                 max_results=3,
                 include_domains=include_domains
             )
             
-            # 검색 결과를 텍스트로 변환
-            output = f"## {query}\n\n"
-            
-            if 'results' in results:
-                for i, result in enumerate(results['results'], 1):
-                    output += f"### 출처 {i}: {result.get('title', 'N/A')}\n"
-                    output += f"URL: {result.get('url', 'N/A')}\n"
-                    output += f"{result.get('content', 'N/A')}\n\n"
-                    
-                print(f"   ✓ {len(results['results'])}개 결과 발견")
-            else:
-                output += "검색 결과 없음\n\n"
-                print(f"   ⚠️ 검색 결과 없음")
-            
-            return output
+            return self._format_results(query, results)
             
         except Exception as e:
             print(f"   ❌ 검색 실패: {str(e)}")
             return f"## {query}\n\n검색 실패: {str(e)}\n\n"
 
+    def _format_results(self, query: str, results: Dict) -> str:
+        """
+        Tavily 검색 결과를 텍스트로 변환
+        """
+        output = f"## {query}\n\n"
+        
+        if 'results' in results:
+            for i, result in enumerate(results['results'], 1):
+                output += f"### 출처 {i}: {result.get('title', 'N/A')}\n"
+                output += f"URL: {result.get('url', 'N/A')}\n"
+                output += f"{result.get('content', 'N/A')}\n\n"
+                
+            print(f"   ✓ {len(results['results'])}개 결과 발견")
+        else:
+            output += "검색 결과 없음\n\n"
+            print(f"   ⚠️ 검색 결과 없음")
+        
+        return output
+
 
 class ArchitectAgent:
     """
@@ -158,11 +253,52 @@ class ArchitectAgent:
 </보고서 템플릿>
 """
     
-    def design_template(self, scout_results: Dict[str, str], 
-                       destination: str, keywords: List[str]) -> str:
+    def itinerary_template(self, destinations: List[str]) -> str:
+        """
+        여러 도시 여정용 기본 템플릿
+        - 입국 규정, 결제, 통신 등 공통 섹션은 한 번만
+        - 숙박, 교통, 관광지 등은 도시별 섹션으로 분리
+        """
+        city_sections = ""
+        for i, destination in enumerate(destinations, 8):
+            city_sections += f"""{i}. {destination}
+   a. 추천 숙박 지역
+   b. 현지 교통수단
+   c. 주요 관광지 (미리 알고 가면 좋을 정보, 역사적 의의, 사진 찍기 좋은 스팟)
+   d. 기념품, 특산물
+"""
+        
+        return f"""
+<보고서 템플릿>
+[공통 - 여정 전체에 한 번만 작성]
+1. 해당 국가 특이사항
+2. 필수 법적 요구사항 (국가별)
+   a. 비자/무비자 규정
+   b. 여권 유효기간
+   c. 거주지 등록 의무
+3. 항공 및 도시 간 이동
+   a. 플랫폼 추천
+   b. 저렴한 시기
+   c. 도시 간 이동 방법
+4. 통신
+   a. USIM
+   b. eSIM
+5. 현지 결제 & 환전
+6. 필수 앱
+7. 준비물
+[도시별]
+{city_sections}{len(destinations) + 8}. 사용자 키워드 관련 내용
+</보고서 템플릿>
+"""
+    
+    def design_template(self, scout_results: Dict[str, Any], 
+                       destination: str, keywords: List[str],
+                       base_template: Optional[str] = None) -> str:
         """
         Scout 결과를 바탕으로 템플릿 커스터마이징
+        - base_template: 기본 템플릿 대신 사용할 템플릿 (여정 모드)
         """
+        base_template = base_template or self.base_template
         print(f"\n{'='*60}")
         print(f"{self.name}: 템플릿 설계 시작")
         print(f"{'='*60}")
@@ -171,7 +307,7 @@ class ArchitectAgent:
 당신은 여행 보고서 템플릿을 설계하는 전문가입니다.
 
 <기본_템플릿>
-{self.base_template}
+{base_template}
 </기본_템플릿>
 
 <여행지>
@@ -196,9 +332,9 @@ class ArchitectAgent:
    - "1. 해당 국가 특이사항" 바로 뒤에 추가
    - 예: "1-1. ⚠️ 필수 거주지 등록 절차"
    
-3. 사용자 키워드({', '.join(keywords)})를 "12. 사용자 키워드 관련 내용"에 구체화:
-   - 12-a. {keywords[0] if keywords else '관광'} 관련 정보
-   - 12-b. {keywords[1] if len(keywords) > 1 else '기타'} 관련 정보
+3. 사용자 키워드({', '.join(keywords)})를 "사용자 키워드 관련 내용" 섹션에 구체화:
+   - a. {keywords[0] if keywords else '관광'} 관련 정보
+   - b. {keywords[1] if len(keywords) > 1 else '기타'} 관련 정보
 
 4. 커스터마이징된 템플릿만 출력하세요 (설명 없이).
 
@@ -229,7 +365,7 @@ class ArchitectAgent:
         except Exception as e:
             print(f"❌ {self.name} 실패: {str(e)}")
             print(f"기본 템플릿 사용")
-            return self.base_template
+            return base_template
 
 
 class WriterAgent:
@@ -242,10 +378,15 @@ class WriterAgent:
     def __init__(self):
         self.name = "✍️ Writer Agent"
     
-    def write_report(self, template: str, scout_results: Dict[str, str],
-                    destination: str, keywords: List[str]) -> str:
+    def write_report(self, template: str, scout_results: Dict[str, Any],
+                    destination: str, keywords: List[str],
+                    research: bool = True, model: str = WRITER_MODEL,
+                    research_destinations: Optional[List[str]] = None) -> str:
         """
         보고서 작성 (필요시 재검색 포함)
+        - research=False: 부족한 정보 재검색 생략 (부하 시)
+        - model: 최종 작성 모델 (부하 시 SCOUT_MODEL)
+        - research_destinations: 도시별로 재검색할 여행지 목록 (여정 모드, 기본은 destination)
         """
         print(f"\n{'='*60}")
         print(f"{self.name}: 보고서 작성 시작")
@@ -253,27 +394,29 @@ class WriterAgent:
         
         # Step 1: 템플릿 분석 및 부족한 정보 파악
         print(f"\n[1/2] 템플릿 분석 중...")
-        missing_info = self._analyze_template(template, scout_results)
+        missing_info = self._analyze_template(template, scout_results) if research else []
         
         # Step 2: 부족한 정보 재검색
         additional_info = ""
         if missing_info:
             print(f"\n[2/2] 부족한 정보 재검색 중...")
-            additional_info = self._research_missing_info(destination, missing_info)
+            additional_info = self._research_missing_info(
+                research_destinations or [destination], missing_info
+            )
         else:
             print(f"\n[2/2] 재검색 불필요 (정보 충분)")
         
         # Step 3: 최종 보고서 작성
         print(f"\n📝 최종 보고서 작성 중...")
         report = self._generate_report(
-            template, scout_results, additional_info, destination, keywords
+            template, scout_results, additional_info, destination, keywords, model
         )
         
         print(f"\n✅ {self.name}: 보고서 작성 완료!")
         
         return report
     
-    def _analyze_template(self, template: str, scout_results: Dict[str, str]) -> List[str]:
+    def _analyze_template(self, template: str, scout_results: Dict[str, Any]) -> List[str]:
         """
         템플릿을 분석하여 부족한 정보 파악
         """
@@ -289,26 +432,33 @@ class WriterAgent:
         print(f"   부족한 정보: {len(missing)}개 항목")
         return missing
     
-    def _research_missing_info(self, destination: str, 
+    def _research_missing_info(self, destinations: List[str], 
                                missing_items: List[str]) -> str:
         """
-        부족한 정보 재검색
+        부족한 정보 재검색 (여행지가 여러 곳이면 도시별로 병렬 검색)
         """
         additional = ""
         
-        for item in missing_items[:2]:  # 최대 2개만 재검색 (비용 절감)
-            print(f"   🔍 재검색: {item}")
-            query = f"{destination} {item}"
+        # 최대 2개 항목만 재검색 (비용 절감)
+        searches = [
+            (destination, item, search_batcher.submit(
+                query=f"{destination} {item}",
+                search_depth="basic",
+                max_results=2
+            ))
+            for item in missing_items[:2]
+            for destination in destinations
+        ]
+        
+        for destination, item, future in searches:
+            label = item if len(destinations) == 1 else f"{destination} {item}"
+            print(f"   🔍 재검색: {label}")
             
             try:
-                results = tavily_client.search(
-                    query=query,
-                    search_depth="basic",
-                    max_results=2
-                )
+                results = future.result()
                 
                 if 'results' in results:
-                    additional += f"\n### {item}\n"
+                    additional += f"\n### {label}\n"
                     for result in results['results']:
                         additional += f"{result.get('content', '')}\n"
                     print(f"      ✓ 정보 수집 완료")
@@ -318,12 +468,21 @@ class WriterAgent:
         
         return additional
     
-    def _generate_report(self, template: str, scout_results: Dict[str, str],
+    def _generate_report(self, template: str, scout_results: Dict[str, Any],
                         additional_info: str, destination: str, 
-                        keywords: List[str]) -> str:
+                        keywords: List[str], model: str = WRITER_MODEL) -> str:
         """
-        최종 보고서 생성
+        최종 보고서 생성 (섹션별 BM25 상위 근거만 프롬프트에 포함)
         """
+        # 여정 모드: 도시별 검색 결과는 도시명을 라벨로 붙여 해당 도시 섹션과 매칭되도록 함
+        evidence = assemble_evidence(template, [
+            ("법적 요건", scout_results['legal_info']),
+            ("주의사항", scout_results['warning_info']),
+            ("키워드", scout_results['keyword_info']),
+            *scout_results.get('city_info', {}).items(),
+            ("추가 조사", additional_info),
+        ])
+
         prompt = f"""
 당신은 전문 여행 작가입니다. 초보 여행자를 위한 친절하고 실용적인 보고서를 작성하세요.
 
@@ -339,25 +498,13 @@ class WriterAgent:
 {template}
 </작성할_템플릿>
 
-<법적_정보_Scout_검색>
-{scout_results['legal_info']}
-</법적_정보_Scout_검색>
-
-<주의사항_Scout_검색>
-{scout_results['warning_info']}
-</주의사항_Scout_검색>
-
-<키워드_정보_Scout_검색>
-{scout_results['keyword_info']}
-</키워드_정보_Scout_검색>
-
-<추가_정보_Writer_재검색>
-{additional_info}
-</추가_정보_Writer_재검색>
+<섹션별_근거_자료>
+{evidence}
+</섹션별_근거_자료>
 
 작업:
-1. 템플릿의 각 항목을 위의 검색 정보를 바탕으로 작성하세요.
-2. 법적 요구사항은 Scout의 검색 결과(외교부 등 공식 소스)를 최우선으로 사용하세요.
+1. 템플릿의 각 항목을 위의 섹션별 근거 자료를 바탕으로 작성하세요.
+2. 법적 요구사항은 "법적 요건" 근거(외교부 등 공식 소스)를 최우선으로 사용하세요.
 3. 중요한 주의사항은 ⚠️로 강조하세요.
 4. 각 섹션을 2-3문장으로 간결하게 작성하세요.
 5. 마크다운 형식으로 작성하세요 (제목은 ##, ### 사용).
@@ -374,7 +521,7 @@ class WriterAgent:
 
         try:
             message = anthropic_client.messages.create(
-                model=WRITER_MODEL,  # Sonnet 사용 (고품질)
+                model=model,  # 기본 Sonnet 사용 (고품질)
                 max_tokens=5000,
                 messages=[{"role": "user", "content": prompt}]
             )
@@ -382,7 +529,7 @@ class WriterAgent:
             return message.content[0].text
             
         except Exception as e:
-            return f"# 오류\n\n보고서 작성 실패: {str(e)}"
+            raise ReportGenerationError(f"보고서 작성 실패: {str(e)}") from e
 
 
 class TripPrepSystem:
@@ -394,33 +541,118 @@ class TripPrepSystem:
         self.scout = ScoutAgent()
         self.architect = ArchitectAgent()
         self.writer = WriterAgent()
+        self.admission = AdmissionController()
+    
+    def handle_request(self, destination: str, keywords: List[str],
+                       priority: str = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """
+        부하 제어를 거쳐 보고서 생성 (웹 요청용)
+        - 반환: {'report': 보고서, 'mode': 적용된 품질 단계, 'models': 사용 모델}
+        - 대기열이 가득 찬 batch 요청은 OverloadedError
+        """
+        with self.admission.admit(priority) as mode:
+            report = self.generate_report(destination, keywords, mode)
+        return {'report': report, 'mode': mode, 'models': self.models_for(mode)}
+    
+    def handle_itinerary_request(self, destinations: List[str], keywords: List[str],
+                                 priority: str = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """
+        부하 제어를 거쳐 여러 도시 통합 보고서 생성 (웹 요청용)
+        """
+        with self.admission.admit(priority) as mode:
+            report = self.generate_itinerary_report(destinations, keywords, mode)
+        return {'report': report, 'mode': mode, 'models': self.models_for(mode)}
     
-    def generate_report(self, destination: str, keywords: List[str]) -> str:
+    def models_for(self, mode: str) -> Dict[str, Optional[str]]:
+        """
+        품질 단계별 사용 모델 (Architect 생략 시 None)
+        """
+        level = DEGRADATION_MODES.index(mode)
+        return {
+            'architect': SCOUT_MODEL if level < 1 else None,
+            'writer': SCOUT_MODEL if level >= 3 else WRITER_MODEL
+        }
+    
+    def generate_report(self, destination: str, keywords: List[str],
+                        mode: str = "full") -> str:
         """
         전체 파이프라인 실행
+        - mode: admission.DEGRADATION_MODES 중 하나 (부하 시 단계적으로 생략)
         """
+        level = DEGRADATION_MODES.index(mode)
+
         print("\n" + "="*70)
         print("🚀 TripPrep 보고서 생성 시작")
         print("="*70)
         print(f"📍 여행지: {destination}")
         print(f"🔑 키워드: {keywords}")
         print(f"🤖 모델: Scout/Architect={SCOUT_MODEL.split('-')[2]}, Writer={WRITER_MODEL.split('-')[2]}")
+        if level > 0:
+            print(f"⚡ 부하 모드: {mode}")
         
         # Agent 1: 정찰
         scout_results = self.scout.scout(destination, keywords)
         
         # input("\n▶️  Enter를 눌러 Agent 2 시작...")
         
-        # Agent 2: 템플릿 설계
-        customized_template = self.architect.design_template(
-            scout_results, destination, keywords
+        # Agent 2, 3: 템플릿 설계 + 보고서 작성
+        return self._design_and_write(
+            scout_results, destination, keywords, level, self.architect.base_template
+        )
+    
+    def generate_itinerary_report(self, destinations: List[str], keywords: List[str],
+                                  mode: str = "full") -> str:
+        """
+        여러 도시 여정 통합 보고서 생성
+        - 국가 단위 검색(입국 규정, 주의사항, 키워드)은 공유, 도시별 검색(관광지, 교통)과 함께 병렬 실행
+        - 공통 섹션(입국 규정, 결제, 통신)은 한 번만 작성
+        """
+        if len(destinations) == 1:
+            return self.generate_report(destinations[0], keywords, mode)
+        
+        level = DEGRADATION_MODES.index(mode)
+        route = " → ".join(destinations)
+
+        print("\n" + "="*70)
+        print("🚀 TripPrep 여정 보고서 생성 시작")
+        print("="*70)
+        print(f"📍 여정: {route}")
+        print(f"🔑 키워드: {keywords}")
+        if level > 0:
+            print(f"⚡ 부하 모드: {mode}")
+        
+        # Agent 1: 여정 정찰
+        scout_results = self.scout.scout_itinerary(destinations, keywords)
+        
+        # Agent 2, 3: 템플릿 설계 + 보고서 작성
+        return self._design_and_write(
+            scout_results, route, keywords, level,
+            self.architect.itinerary_template(destinations), destinations
         )
+    
+    def _design_and_write(self, scout_results: Dict[str, Any], destination: str,
+                          keywords: List[str], level: int, base_template: str,
+                          destinations: Optional[List[str]] = None) -> str:
+        """
+        Agent 2 (템플릿 설계) + Agent 3 (보고서 작성)
+        - destinations: 여정 모드의 도시 목록 (재검색을 도시별로 수행)
+        """
+        # Agent 2: 템플릿 설계 (부하 시 기본 템플릿)
+        if level >= 1:
+            customized_template = base_template
+        else:
+            customized_template = self.architect.design_template(
+                scout_results, destination, keywords, base_template
+            )
         
         # input("\n▶️  Enter를 눌러 Agent 2 시작...")
         
         # Agent 3: 보고서 작성
         report = self.writer.write_report(
-            customized_template, scout_results, destination, keywords
+            customized_template, scout_results, destination, keywords,
+            research=level < 2,
+            model=SCOUT_MODEL if level >= 3 else WRITER_MODEL,
+            research_destinations=destinations
         )
         
         print("\n" + "="*70)
@@ -451,10 +683,11 @@ def main():
     """)
     
     # 사용자 입력
-    destination = input("📍 여행지를 입력하세요 (예: 일본 도쿄): ").strip()
+    destination = input("📍 여행지를 입력하세요 (여러 도시는 쉼표로 구분, 예: 일본 도쿄): ").strip()
     if not destination:
         destination = "일본 도쿄"
         print(f"   → 기본값 사용: {destination}")
+    destinations = [d.strip() for d in destination.split(",") if d.strip()]
     
     keywords_input = input("🔑 관심 키워드를 입력하세요 (쉼표로 구분, 예: 온천,라멘): ").strip()
     if keywords_input:
@@ -465,10 +698,14 @@ def main():
     
     # 시스템 초기화 및 실행
     system = TripPrepSystem()
-    report = system.generate_report(destination, keywords)
+    try:
+        report = system.generate_itinerary_report(destinations, keywords)
+    except ReportGenerationError as e:
+        print(f"\n❌ {str(e)}")
+        return
     
     # 보고서 저장
-    filename = f"report_{destination.replace(' ', '_')}.md"
+    filename = f"report_{'_'.join(d.replace(' ', '_') for d in destinations)}.md"
     with open(filename, "w", encoding="utf-8") as f:
         f.write(report)
     
@@ -1,22 +1,28 @@
 import os
 import asyncio
-import json
+import logging
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
 # --- 외부 라이브러리 (pip install anthropic tavily-python rich pydantic) ---
 from anthropic import AsyncAnthropic
 from tavily import TavilyClient
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.markdown import Markdown
 from rich.table import Table
 
+from evidence_index import assemble_evidence
+from knowledge_base import LEGAL_DOMAINS, knowledge_base, resolve_country
+from search_batcher import SearchBatcher
+
 # 환경 변수 로드
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # API 키 설정
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
@@ -30,6 +36,10 @@ aclient = AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
 tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
 console = Console()
 
+# Tavily 검색 마이크로 배칭: 동시 요청의 검색을 짧은 시간 창 단위로 모아 중복 제거 후
+# 전용 스레드 풀에서 실행 (병렬도는 SEARCH_BATCH_MAX_PARALLEL, v1과 동일한 설정 사용)
+search_batcher = SearchBatcher(tavily_client.search)
+
 # 모델 설정
 FAST_MODEL = "claude-3-5-haiku-20241022"
 SMART_MODEL = "claude-sonnet-4-5-20250929"  
@@ -48,6 +58,7 @@ class TripContext(BaseModel):
     keywords: List[str]
     scout_data: List[SearchResult] = Field(default_factory=list)
     template: str = ""
+    gap_queries: List[str] = Field(default_factory=list)
     additional_data: List[SearchResult] = Field(default_factory=list)
 
     def get_combined_info(self) -> str:
@@ -62,21 +73,43 @@ class TripContext(BaseModel):
                 text += f"### Q: {item.query}\n{item.content}\n\n"
         return text
 
+    def get_documents(self) -> List[tuple]:
+        """수집된 정보를 (검색 쿼리, 내용) 목록으로 반환 (섹션별 근거 선택용)"""
+        return [(item.query, item.content) for item in self.scout_data + self.additional_data]
+
+class TripPlan(BaseModel):
+    """Architect의 구조화된 출력 (목차 + 부족한 정보 검색 쿼리)"""
+    template: str = Field(min_length=1, description="번호가 매겨진 보고서 목차")
+    gap_queries: List[str] = Field(
+        default_factory=list,
+        description="목차를 완성하기 위해 추가로 검색할 쿼리 (최대 3개, 부족한 정보가 없으면 빈 리스트)"
+    )
+
+    @field_validator("gap_queries")
+    @classmethod
+    def _clean_queries(cls, queries: List[str]) -> List[str]:
+        """빈 쿼리 제거, 최대 3개로 제한"""
+        return [q.strip() for q in queries if q.strip()][:3]
+
 # --- 유틸리티 함수 ---
 
-async def async_tavily_search(query: str, depth: str = "basic") -> SearchResult:
+async def async_tavily_raw(query: str, depth: str = "basic",
+                           include_domains: Optional[List[str]] = None) -> Dict:
+    """Tavily 검색을 비동기로 실행하고 원본 응답을 반환 (마이크로 배칭 경유, Non-blocking)"""
+    try:
+        return await search_batcher.asearch(query, depth, max_results=3,
+                                            include_domains=include_domains)
+    except Exception as e:
+        return {"results": [], "error": str(e)}
+
+async def async_tavily_search(query: str, depth: str = "basic",
+                              include_domains: Optional[List[str]] = None) -> SearchResult:
     """Tavily 검색을 비동기로 실행하는 래퍼 함수"""
-    loop = asyncio.get_running_loop()
-    
-    def _search():
-        try:
-            return tavily_client.search(query=query, search_depth=depth, max_results=3)
-        except Exception as e:
-            return {"results": [], "error": str(e)}
-
-    # ThreadPoolExecutor에서 실행하여 Non-blocking 구현
-    response = await loop.run_in_executor(None, _search)
-    
+    response = await async_tavily_raw(query, depth, include_domains)
+    return to_search_result(query, response)
+
+def to_search_result(query: str, response: Dict) -> SearchResult:
+    """Tavily 응답(또는 지식 베이스 항목)을 SearchResult로 변환"""
     content_parts = []
     sources = []
     
@@ -93,58 +126,110 @@ async def async_tavily_search(query: str, depth: str = "basic") -> SearchResult:
 
 # --- 에이전트 클래스 정의 ---
 
-class ScoutAgent:
+# Architect 출력 검증이 반복 실패할 때 사용하는 기본 목차
+DEFAULT_TEMPLATE = """1. 해당 국가 특이사항
+2. 필수 법적 요구사항 (비자/무비자 규정, 여권 유효기간, 거주지 등록 의무)
+3. 항공
+4. 숙박
+5. 통신 (USIM, eSIM)
+6. 현지 결제 & 환전
+7. 현지 교통수단
+8. 필수 앱
+9. 준비물
+10. 주요 관광지
+11. 기념품, 특산물
+12. 사용자 키워드 관련 내용"""
+
+# Architect 구조화 출력용 도구 정의 (입력 스키마 = TripPlan)
+PLAN_TOOL = {
+    "name": "submit_trip_plan",
+    "description": "여행 보고서 목차와 부족한 정보를 찾을 추가 검색 쿼리를 제출합니다.",
+    "input_schema": TripPlan.model_json_schema(),
+}
+
+class BaseAgent:
+    """공통 출력 처리: verbose=False 이면 rich 콘솔/프로그레스 출력을 모두 생략 (웹 서빙용)"""
+
+    def __init__(self, verbose: bool = True):
+        self.verbose = verbose
+
+    def _log(self, *renderables):
+        if self.verbose:
+            console.print(*renderables)
+
+
+class ScoutAgent(BaseAgent):
     """🕵️ Scout Agent: 병렬 검색 수행"""
     
-    def __init__(self):
+    def __init__(self, verbose: bool = True):
+        super().__init__(verbose)
         self.name = "Scout Agent"
 
     async def run(self, ctx: TripContext) -> TripContext:
-        console.print(Panel(f"[bold green]{self.name}[/bold green] 가 정찰을 시작합니다...", border_style="green"))
+        self._log(Panel(f"[bold green]{self.name}[/bold green] 가 정찰을 시작합니다...", border_style="green"))
         
-        queries = [
-            (f"{ctx.destination} 입국 규정 비자 필수 요건", "advanced"),
-            (f"{ctx.destination} 여행 치안 주의사항", "basic"),
-        ]
+        queries = [(f"{ctx.destination} 여행 치안 주의사항", "basic")]
         if ctx.keywords:
             queries.append((f"{ctx.destination} {ctx.keywords[0]} 추천 명소", "basic"))
 
-        # Rich Progress Bar와 함께 병렬 실행
-        results = []
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            transient=True
-        ) as progress:
-            task = progress.add_task("[cyan]정보 수집 중...", total=len(queries))
-            
-            # asyncio.gather로 병렬 처리
-            tasks = [async_tavily_search(q, d) for q, d in queries]
-            
-            for completed_task in asyncio.as_completed(tasks):
-                result = await completed_task
-                results.append(result)
-                progress.advance(task)
+        # asyncio로 병렬 처리 (법적 요건은 국가 지식 베이스 경유)
+        tasks = [self._search_legal(resolve_country(ctx.destination))]
+        tasks += [async_tavily_search(q, d) for q, d in queries]
+
+        if self.verbose:
+            # Rich Progress Bar와 함께 병렬 실행
+            results = []
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                transient=True
+            ) as progress:
+                task = progress.add_task("[cyan]정보 수집 중...", total=len(tasks))
+
+                for completed_task in asyncio.as_completed(tasks):
+                    result = await completed_task
+                    results.append(result)
+                    progress.advance(task)
+        else:
+            results = list(await asyncio.gather(*tasks))
 
         ctx.scout_data = results
-        console.print(f"✅ [bold green]정찰 완료:[/bold green] {len(results)}개 주제에 대한 정보 수집됨")
+        self._log(f"✅ [bold green]정찰 완료:[/bold green] {len(results)}개 주제에 대한 정보 수집됨")
         return ctx
 
+    async def _search_legal(self, country: str) -> SearchResult:
+        """
+        법적 요건 검색 (국가 지식 베이스에 있으면 재사용, 가장 느린 advanced 검색 생략)
+        - 지식 베이스는 파일 I/O이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+        """
+        entry = await asyncio.to_thread(knowledge_base.get, country)
+        if entry:
+            self._log(f"[dim]📚 국가 지식 베이스 사용: {country} (갱신: {entry['refreshed_at'][:10]})[/dim]")
+            return to_search_result(entry["query"], entry)
 
-class ArchitectAgent:
-    """🏗️ Architect Agent: 동적 템플릿 설계"""
+        legal_query = f"{country} 입국 규정 비자 필수 요건"
+        response = await async_tavily_raw(legal_query, "advanced", LEGAL_DOMAINS)
+        if response.get("results"):
+            await asyncio.to_thread(knowledge_base.put, country, legal_query, response["results"])
+        return to_search_result(legal_query, response)
 
-    def __init__(self):
+
+class ArchitectAgent(BaseAgent):
+    """🏗️ Architect Agent: 동적 템플릿 설계 + Gap Analysis (한 번의 구조화된 호출)"""
+
+    def __init__(self, verbose: bool = True):
+        super().__init__(verbose)
         self.name = "Architect Agent"
 
     async def run(self, ctx: TripContext) -> TripContext:
-        console.print(Panel(f"[bold blue]{self.name}[/bold blue] 가 템플릿을 설계합니다...", border_style="blue"))
+        self._log(Panel(f"[bold blue]{self.name}[/bold blue] 가 템플릿을 설계합니다...", border_style="blue"))
 
         scout_summary = ctx.get_combined_info()
         
         prompt = f"""
 당신은 여행 보고서 설계자입니다.
-수집된 정보를 바탕으로 '{ctx.destination}' 여행을 위한 최적의 목차(Template)를 작성하세요.
+수집된 정보를 바탕으로 '{ctx.destination}' 여행을 위한 최적의 목차(Template)를 작성하고,
+그 목차를 완성하기 위해 부족한 정보를 찾을 검색 쿼리를 함께 만드세요.
 
 [수집된 정보]
 {scout_summary}
@@ -155,87 +240,82 @@ class ArchitectAgent:
 [지침]
 1. 일반적인 여행 정보(항공, 숙박, 교통) 외에 수집된 정보의 '특이사항(경고, 필수요건)'을 상단에 배치하세요.
 2. 사용자 키워드 관련 섹션을 구체적으로 만드세요.
-3. 번호가 매겨진 목차 형식으로만 출력하세요. 설명은 필요 없습니다.
+3. template: 번호가 매겨진 목차 형식으로만 작성하세요. 설명은 필요 없습니다.
+4. gap_queries: 목차를 완성하기 위해 **절대적으로 부족한 정보**만 최대 3개의 검색 쿼리로 작성하세요.
+   - 예: 목차에 '교통'이 있는데 수집된 정보에 교통 정보가 없다면 "도쿄 지하철 패스 가격"
+   - 부족한 정보가 없다면 빈 리스트로 두세요.
+5. 반드시 submit_trip_plan 도구로 결과를 제출하세요.
 """
-        response = await aclient.messages.create(
-            model=FAST_MODEL,
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        ctx.template = response.content[0].text
-        console.print(Markdown(f"**생성된 템플릿 요약:**\n{ctx.template[:200]}..."))
+        # 검증 실패 시 한 번 재시도 (잘린 출력 대비 max_tokens 증가), 그래도 실패하면 기본 목차 사용
+        plan = None
+        for attempt, max_tokens in enumerate((1500, 3000), 1):
+            response = await aclient.messages.create(
+                model=FAST_MODEL,
+                max_tokens=max_tokens,
+                tools=[PLAN_TOOL],
+                tool_choice={"type": "tool", "name": PLAN_TOOL["name"]},
+                messages=[{"role": "user", "content": prompt}]
+            )
+            try:
+                plan = self._parse_plan(response)
+                break
+            except ValueError as e:
+                logger.warning("Architect 출력 검증 실패 (%d/2): %s", attempt, e)
+
+        if plan is None:
+            logger.warning("Architect 기본 목차 사용, 추가 검색 생략")
+            plan = TripPlan(template=DEFAULT_TEMPLATE)
+
+        ctx.template = plan.template
+        ctx.gap_queries = plan.gap_queries
+        self._log(Markdown(f"**생성된 템플릿 요약:**\n{ctx.template[:200]}..."))
         return ctx
 
+    def _parse_plan(self, response) -> TripPlan:
+        """tool_use 블록을 TripPlan으로 검증 (실패 시 원인과 함께 예외 발생)"""
+        if response.stop_reason == "max_tokens":
+            raise ValueError("max_tokens 도달로 출력이 잘렸습니다")
+        for block in response.content:
+            if block.type == "tool_use" and block.name == PLAN_TOOL["name"]:
+                try:
+                    return TripPlan.model_validate(block.input)
+                except ValidationError as e:
+                    raise ValueError(f"Architect 출력 검증 실패: {e}") from e
+        raise ValueError("Architect 응답에 submit_trip_plan 결과가 없습니다")
 
-class WriterAgent:
-    """✍️ Writer Agent: Gap Analysis(지능형 부족 정보 분석) + 리포트 작성"""
 
-    def __init__(self):
+class WriterAgent(BaseAgent):
+    """✍️ Writer Agent: 추가 리서치 + 리포트 작성"""
+
+    def __init__(self, verbose: bool = True):
+        super().__init__(verbose)
         self.name = "Writer Agent"
 
     async def run(self, ctx: TripContext) -> str:
-        console.print(Panel(f"[bold magenta]{self.name}[/bold magenta] 가 보고서를 작성합니다...", border_style="magenta"))
+        self._log(Panel(f"[bold magenta]{self.name}[/bold magenta] 가 보고서를 작성합니다...", border_style="magenta"))
 
-        # 1. Gap Analysis (지능형 부족 정보 파악)
-        console.print("[dim]🧠 현재 정보와 템플릿을 비교하여 부족한 정보를 분석 중...[/dim]")
-        gap_queries = await self._analyze_gaps(ctx)
-        
-        # 2. 추가 리서치 (필요한 경우에만)
+        # 1. 추가 리서치 (Architect가 찾은 부족한 정보가 있는 경우에만)
+        gap_queries = ctx.gap_queries
         if gap_queries:
-            console.print(f"[bold yellow]🔍 추가 리서치 필요:[/bold yellow] {len(gap_queries)}건")
-            with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), transient=True) as progress:
-                progress.add_task("[yellow]추가 정보 검색 중...", total=None)
-                # 병렬 검색
-                tasks = [async_tavily_search(q) for q in gap_queries]
+            self._log(f"[bold yellow]🔍 추가 리서치 필요:[/bold yellow] {len(gap_queries)}건")
+            # 병렬 검색
+            tasks = [async_tavily_search(q) for q in gap_queries]
+            if self.verbose:
+                with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), transient=True) as progress:
+                    progress.add_task("[yellow]추가 정보 검색 중...", total=None)
+                    additional_results = await asyncio.gather(*tasks)
+            else:
                 additional_results = await asyncio.gather(*tasks)
-                ctx.additional_data = additional_results
+            ctx.additional_data = list(additional_results)
         else:
-            console.print("[bold green]✨ 추가 검색 불필요 (정보 충분)[/bold green]")
+            self._log("[bold green]✨ 추가 검색 불필요 (정보 충분)[/bold green]")
 
-        # 3. 최종 작성
-        console.print("[dim]📝 최종 보고서 생성 중...[/dim]")
+        # 2. 최종 작성
+        self._log("[dim]📝 최종 보고서 생성 중...[/dim]")
         final_report = await self._write_final_report(ctx)
         
         return final_report
 
-    async def _analyze_gaps(self, ctx: TripContext) -> List[str]:
-        """LLM을 통해 템플릿 작성에 부족한 정보가 무엇인지 판단하고 검색 쿼리 생성"""
-        prompt = f"""
-현재 우리는 '{ctx.destination}' 여행 보고서를 작성 중입니다.
-
-[목차 (Template)]
-{ctx.template}
-
-[현재 보유 정보]
-{ctx.get_combined_info()}
-
-[지시사항]
-1. 목차를 완성하기 위해 **절대적으로 부족한 정보**가 있는지 판단하세요.
-2. 예를 들어, 목차에 '교통'이 있는데 보유 정보에 교통 정보가 없다면 검색이 필요합니다.
-3. 최대 3개의 추가 검색 쿼리를 생성하세요.
-4. 부족한 정보가 없다면 'NONE'이라고만 답하세요.
-5. 출력 형식: JSON 포맷의 문자열 리스트 (예: ["도쿄 지하철 패스 가격", "도쿄 11월 날씨"])
-"""
-        response = await aclient.messages.create(
-            model=FAST_MODEL,
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        content = response.content[0].text.strip()
-        if "NONE" in content:
-            return []
-        
-        try:
-            # JSON 파싱 시도 (LLM이 마크다운 코드블럭을 쓸 경우 처리)
-            cleaned_json = content.replace("```json", "").replace("```", "").strip()
-            queries = json.loads(cleaned_json)
-            return queries if isinstance(queries, list) else []
-        except:
-            console.print("[red]⚠️ Gap Analysis 파싱 실패, 추가 검색 생략[/red]")
-            return []
-
     async def _write_final_report(self, ctx: TripContext) -> str:
         prompt = f"""
 당신은 최고의 여행 전문 에디터입니다. 아래 정보를 종합하여 완벽한 여행 보고서를 작성하세요.
@@ -246,8 +326,8 @@ class WriterAgent:
 [설계된 목차]
 {ctx.template}
 
-[모든 수집된 정보]
-{ctx.get_combined_info()}
+[섹션별 근거 자료]
+{assemble_evidence(ctx.template, ctx.get_documents())}
 
 [작성 규칙]
 1. 어조: 친절하고 전문적이며, 읽기 쉽게 작성하세요.
@@ -267,6 +347,19 @@ class WriterAgent:
 
 # --- 메인 오케스트레이터 ---
 
+async def generate_report(destination: str, keywords: List[str], verbose: bool = False) -> str:
+    """
+    v2 파이프라인 실행 (Scout → Architect → Writer)
+    - 모듈 전역 AsyncAnthropic 클라이언트를 공유하므로 하나의 이벤트 루프에서 다수 요청을 동시에 처리 가능
+    - 웹 서빙 경로에서는 verbose=False 로 rich 출력을 끔
+    """
+    ctx = TripContext(destination=destination, keywords=keywords)
+
+    ctx = await ScoutAgent(verbose).run(ctx)
+    ctx = await ArchitectAgent(verbose).run(ctx)
+    return await WriterAgent(verbose).run(ctx)
+
+
 async def main():
     # 타이틀 출력
     console.print(Panel.fit(
@@ -280,23 +373,9 @@ async def main():
     keywords_input = console.input("[bold green]🔑 키워드 입력 (콤마 구분, 예: 맛집,쇼핑): [/bold green]").strip()
     keywords = [k.strip() for k in keywords_input.split(",")] if keywords_input else ["맛집", "쇼핑"]
 
-    # 컨텍스트 초기화
-    ctx = TripContext(destination=destination, keywords=keywords)
-
-    # 에이전트 초기화
-    scout = ScoutAgent()
-    architect = ArchitectAgent()
-    writer = WriterAgent()
-
     try:
-        # 1. Scout 실행
-        ctx = await scout.run(ctx)
-        
-        # 2. Architect 실행
-        ctx = await architect.run(ctx)
-        
-        # 3. Writer 실행
-        final_report = await writer.run(ctx)
+        # Scout → Architect → Writer 실행
+        final_report = await generate_report(destination, keywords, verbose=True)
 
         # 결과 저장 및 출력
         filename = f"TripPrep_{destination}.md"